@@ -3,11 +3,18 @@
 
 """
 An auto-reloading standalone wiki server, useful for development.
+
+Requests are served in threads, so a slow page doesn't block the others,
+but CPU-heavy work like parsing still shares the GIL. For production use
+a real WSGI server, e.g. gunicorn -k gthread -w 4.
+
+Set HATTA_PROFILE=1 in the environment to profile every request.
 """
 
+import os
+
 import hatta
 import werkzeug
-from werkzeug.middleware.profiler import ProfilerMiddleware
 
 if __name__=="__main__":
     config = hatta.WikiConfig()
@@ -18,8 +25,10 @@ if __name__=="__main__":
 
     application = wiki.application
 
-    # application = ProfilerMiddleware(application)
+    if os.environ.get('HATTA_PROFILE'):
+        from werkzeug.middleware.profiler import ProfilerMiddleware
+        application = ProfilerMiddleware(application)
 
     host = config.get('interface', 'localhost')
     port = int(config.get('port', 8080))
-    werkzeug.run_simple(host, port, application, use_reloader=True)
+    werkzeug.run_simple(host, port, application, use_reloader=True, threaded=True)
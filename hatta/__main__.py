@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import os
+import signal
 import sys
 
 from hatta.config import read_config
@@ -26,6 +27,12 @@ def application(env, start):
     return application(env, start)
 
 
+def _terminate(signum, frame):
+    """Make SIGTERM shut the server down the same way as Ctrl-C."""
+
+    raise KeyboardInterrupt()
+
+
 def main(config=None, wiki=None):
     """Start a standalone WSGI server."""
 
@@ -39,11 +46,18 @@ def main(config=None, wiki=None):
         from cheroot import wsgi
     except ImportError:
         wsgi = None
+    try:
+        signal.signal(signal.SIGTERM, _terminate)
+    except ValueError:
+        # not running in the main thread
+        pass
 
     if wsgi is None:
         import werkzeug
         try:
-            werkzeug.run_simple(host, port, app, use_reloader=False)
+            # threads also make werkzeug speak HTTP/1.1 with keep-alive
+            werkzeug.run_simple(host, port, app, use_reloader=False,
+                                threaded=True)
         except KeyboardInterrupt:
             pass
     else:
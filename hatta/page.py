@@ -2,8 +2,10 @@
 # -*- coding: utf-8 -*-
 
 import difflib
+import functools
 import hashlib
 import io
+import itertools
 import mimetypes
 import os
 import re
@@ -34,6 +36,20 @@ try:
                 formatter.line_no += 1
             yield 0, "</pre></div>"
 
+    @functools.lru_cache(maxsize=1)
+    def _get_formatter():
+        """The formatter keeps no state between uses, but is slow to make."""
+
+        return WikiWrapFormatter()
+
+    @functools.lru_cache(maxsize=256)
+    def _get_lexer_class(mime=None, syntax=None):
+        """Finding a lexer scans all of them, so remember the results."""
+
+        if mime:
+            return type(pygments.lexers.get_lexer_for_mimetype(mime))
+        return type(pygments.lexers.get_lexer_by_name(syntax))
+
 except ImportError:
     pass
 
@@ -49,9 +65,22 @@ try:
 except ImportError:
     pass
 
+SequenceMatcher = difflib.SequenceMatcher
+try:
+    from cdifflib import CSequenceMatcher as SequenceMatcher
+except ImportError:
+    pass
+
 import hatta.error
 import hatta.parser
 
+# Changed parts of lines in difflib._mdiff output, or single characters
+DIFF_MARK_RE = re.compile("\0[-+^]([^\1\0]*)\1|([^\0\1])")
+
+# Matching words inside changed blocks grows with the product of their
+# line counts, bigger blocks are shown as whole deleted and inserted lines.
+MAX_INLINE_DIFF = 2500
+
 
 def url_fix(url_candidate, encoding="utf-8"):
     # This function was removed in Werkzeug 3.0
@@ -62,6 +91,33 @@ def url_fix(url_candidate, encoding="utf-8"):
     return parse.urlunsplit((url.scheme, url.netloc, path, qs, anchor))
 
 
+def diff_lines(from_lines, to_lines):
+    """
+    Like difflib._mdiff, but only looks for changes inside lines in the
+    changed blocks that are small enough.
+    """
+
+    matcher = SequenceMatcher(None, from_lines, to_lines)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            for i, j in zip(range(i1, i2), range(j1, j2)):
+                yield (i + 1, from_lines[i]), (j + 1, to_lines[j]), False
+            continue
+        if (i2 - i1) * (j2 - j1) <= MAX_INLINE_DIFF:
+            diffs = difflib._mdiff(from_lines[i1:i2], to_lines[j1:j2])
+        else:
+            diffs = itertools.chain(
+                difflib._mdiff(from_lines[i1:i2], []),
+                difflib._mdiff([], to_lines[j1:j2]),
+            )
+        for (old_no, old_text), (new_no, new_text), changed in diffs:
+            if old_no:
+                old_no += i1
+            if new_no:
+                new_no += j1
+            yield (old_no, old_text), (new_no, new_text), changed
+
+
 def check_lock(wiki, title):
     _ = wiki.gettext
     restricted_pages = [
@@ -449,47 +505,52 @@ class WikiPageText(WikiPage):
             while True:
                 yield None
 
-        diff = difflib._mdiff(from_text.split("\n"), to_text.split("\n"))
-        mark_re = re.compile("\0[-+^]([^\1\0]*)\1|([^\0\1])")
+        diff = diff_lines(from_text.split("\n"), to_text.split("\n"))
         yield message
-        yield '<pre class="diff">'
+        # collect the many small pieces and pass them on in big chunks
+        parts = ['<pre class="diff">']
+        emit = parts.append
         for old_line, new_line, changed in diff:
             old_no, old_text = old_line
             new_no, new_text = new_line
             line_no = (new_no or old_no or 1) - 1
             if changed:
-                yield '<div class="change" id="line_%d">' % line_no
-                old_iter = infiniter(mark_re.finditer(old_text))
-                new_iter = infiniter(mark_re.finditer(new_text))
+                emit('<div class="change" id="line_%d">' % line_no)
+                old_iter = infiniter(DIFF_MARK_RE.finditer(old_text))
+                new_iter = infiniter(DIFF_MARK_RE.finditer(new_text))
                 old = next(old_iter)
                 new = next(new_iter)
-                buff = ""
+                buff = []
                 while old or new:
                     while old and old.group(1):
                         if buff:
-                            yield escape(buff)
-                            buff = ""
-                        yield "<del>%s</del>" % escape(old.group(1))
+                            emit(escape("".join(buff)))
+                            del buff[:]
+                        emit("<del>%s</del>" % escape(old.group(1)))
                         old = next(old_iter)
                     while new and new.group(1):
                         if buff:
-                            yield escape(buff)
-                            buff = ""
-                        yield "<ins>%s</ins>" % escape(new.group(1))
+                            emit(escape("".join(buff)))
+                            del buff[:]
+                        emit("<ins>%s</ins>" % escape(new.group(1)))
                         new = next(new_iter)
                     if new:
-                        buff += new.group(2)
+                        buff.append(new.group(2))
                     old = next(old_iter)
                     new = next(new_iter)
                 if buff:
-                    yield escape(buff)
-                yield "</div>"
+                    emit(escape("".join(buff)))
+                emit("</div>")
             else:
-                yield '<div class="orig" id="line_%d">%s</div>' % (
-                    line_no,
-                    escape(old_text),
+                emit(
+                    '<div class="orig" id="line_%d">%s</div>'
+                    % (line_no, escape(old_text))
                 )
-        yield "</pre>"
+            if len(parts) >= 1024:
+                yield "".join(parts)
+                del parts[:]
+        emit("</pre>")
+        yield "".join(parts)
 
 
 class WikiPageColorText(WikiPageText):
@@ -511,14 +572,11 @@ class WikiPageColorText(WikiPageText):
             yield Markup(tags.pre(text))
             return
 
-        formatter = WikiWrapFormatter()
-        formatter.line_no = line_no
+        formatter = _get_formatter()
 
         try:
-            if mime:
-                lexer = pygments.lexers.get_lexer_for_mimetype(mime)
-            elif syntax:
-                lexer = pygments.lexers.get_lexer_by_name(syntax)
+            if mime or syntax:
+                lexer = _get_lexer_class(mime, syntax)()
             else:
                 lexer = pygments.lexers.guess_lexer(text)
         except:
@@ -559,6 +617,15 @@ class WikiPageWiki(WikiPageColorText):
                 self.revision.rev,
             )
             cached = self.wiki.cache.get(cache_key)
+            timeout = 86400
+        elif self.wiki.cache and lines:
+            # previews are keyed by their text, so that previewing the
+            # same text again doesn't parse it again
+            cache_key = "preview:%s" % (
+                hashlib.md5("\n".join(lines).encode("utf8")).hexdigest()
+            )
+            cached = self.wiki.cache.get(cache_key)
+            timeout = 300
         else:
             cache_key = None
             cached = None
@@ -584,7 +651,7 @@ class WikiPageWiki(WikiPageColorText):
             )
             cached = list(content)
             if cache_key:
-                self.wiki.cache.set(cache_key, cached, timeout=86400)
+                self.wiki.cache.set(cache_key, cached, timeout=timeout)
         return cached
 
     def wiki_math(self, math_text, display=False):
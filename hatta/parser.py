@@ -45,6 +45,8 @@ class RuleSet(object):
         else:
             self.rules = {}
         self.compiled_re = None
+        self.compiled_rules = None
+        self.rule_params = {}
 
     def __call__(self, pattern, priority=100, name=None):
         """A decorator that registers the function as a rule."""
@@ -64,14 +66,25 @@ class RuleSet(object):
         self.rules[function_name] = (priority, pattern, function)
 
     def compile(self):
-        """Prepare the registered rule patterns for parsing."""
+        """
+        Prepare the registered rule patterns for parsing. Does nothing
+        if the rules didn't change since the last call.
+        """
 
+        if self.compiled_re is not None and self.rules == self.compiled_rules:
+            return
         rules = sorted(iter(self.rules.items()), key=lambda x: x[1][0])
         self.compiled_re = re.compile(
             r"|".join(
                 r"(?P<%s>%s)" % (function_name, pattern) for
                     (function_name, (priority, pattern, function)) in rules
             ), re.U)
+        # the named groups of each rule, to be passed to its function
+        self.rule_params = dict(
+            (function_name, tuple(re.compile(pattern, re.U).groupindex))
+            for (function_name, (priority, pattern, function)) in rules
+        )
+        self.compiled_rules = dict(self.rules)
 
     def match_one(self, text):
         """Find the first rule matching provided text."""
@@ -91,20 +104,49 @@ class RuleSet(object):
             params = match.groupdict()
             yield function_name, params
 
+    def bind(self, obj):
+        """
+        Get a dict mapping the rule names to the corresponding methods
+        of provided object.
+        """
+
+        return dict(
+            (function_name, getattr(obj, function.__name__))
+            for (function_name, (priority, pattern, function))
+            in self.rules.items()
+        )
+
     def parse(self, text, bind_to=None):
         """
         Find all matching rules and call corresponding functions.
         If bind_to is provided, it will call the methods of provided object.
         """
 
-        for function_name, params in self.match_all(text):
-            priority, pattern, function = self.rules[function_name]
-            if bind_to is not None:
-                function = getattr(bind_to, function.__name__)
-            params = dict((str(k), v) for (k, v) in params.items()
-                          if v is not None and k not in self.rules)
+        if bind_to is not None:
+            functions = self.bind(bind_to)
+        else:
+            functions = dict(
+                (function_name, function)
+                for (function_name, (priority, pattern, function))
+                in self.rules.items()
+            )
+        return self.dispatch(text, functions)
 
-            yield function(**params)
+    def dispatch(self, text, functions):
+        """
+        Find all matching rules and call the functions for them from the
+        provided dict, as returned by bind.
+        """
+
+        rule_params = self.rule_params
+        for match in self.compiled_re.finditer(text):
+            function_name = match.lastgroup
+            params = {}
+            for name in rule_params[function_name]:
+                value = match.group(name)
+                if value is not None:
+                    params[name] = value
+            yield functions[function_name](**params)
 
 
 class WikiParser(object):
@@ -188,13 +230,17 @@ class WikiParser(object):
         self.conflict_sep_re = re.compile(r"^=======\s*$", re.U)
         self.display_math_close_re = re.compile(r"^[$][$]\s*$", re.U)
         self.image_re = re.compile(self.image_pat, re.U)
-        smileys = r"|".join(re.escape(k) for k in self.smilies)
+        smileys = r"|".join(re.escape(k) for k in
+                            sorted(self.smilies, key=len, reverse=True))
         smiley_pat = (r"(^|\b|(?<=\s))(?P<smiley_face>%s)"
                       r"((?=[\s.,:;!?)/&=+-])|$)" % smileys)
         self.markup_rules.add_rule(
-                self._line_smiley, smiley_pat, 125)
+                type(self)._line_smiley, smiley_pat, 125)
         self.markup_rules.compile()
         self.block_rules.compile()
+        self.line_functions = self.markup_rules.bind(self)
+        self.block_functions = self.block_rules.bind(self)
+        self.block_functions["_block_paragraph"] = self._block_paragraph
 
     def __iter__(self):
         return self.parse()
@@ -227,13 +273,19 @@ class WikiParser(object):
         if enumerated_lines is None:
             enumerated_lines = self.enumerated_lines
 
+        match = self.block_rules.compiled_re.match
+
         def key(enumerated_line):
             line_no, line = enumerated_line
-            name, params = self.block_rules.match_one(line)
-            return name or "_block_paragraph"
+            # only the rule name is needed here, not the groups
+            m = match(line)
+            if m is None:
+                return "_block_paragraph"
+            return m.lastgroup
 
+        block_functions = self.block_functions
         for kind, block in itertools.groupby(enumerated_lines, key):
-            func = getattr(self, kind)
+            func = block_functions[kind]
 
             for part in func(block):
                 yield Markup(part)
@@ -243,7 +295,7 @@ class WikiParser(object):
         Find all the line-level markup and return HTML for it.
 
         """
-        for part in self.markup_rules.parse(line, self):
+        for part in self.markup_rules.dispatch(line, self.line_functions):
             yield Markup(part)
 
     def pop_to(self, stop):
@@ -251,15 +303,16 @@ class WikiParser(object):
             Pop from the stack until the specified tag is encoutered.
             Return string containing closing tags of everything popped.
         """
-        tags = []
-        tag = None
-        try:
-            while tag != stop:
-                tag = self.stack.pop()
-                tags.append(tag)
-        except IndexError:
-            pass
-        return Markup("".join("</%s>" % tag for tag in tags))
+        stack = self.stack
+        if not stack:
+            return Markup("")
+        if stop in stack:
+            index = len(stack) - 1 - stack[::-1].index(stop)
+        else:
+            index = 0
+        tags = stack[index:]
+        del stack[index:]
+        return Markup("".join("</%s>" % tag for tag in reversed(tags)))
 
     def lines_until(self, close_re):
         """Get lines from input until the closing markup is encountered."""
@@ -313,9 +366,11 @@ class WikiParser(object):
             self.stack.append('tt')
             return Markup("<tt>")
 
+    # longest first, so that "---" isn't taken for "--" followed by "-"
     @markup_rules(r'(?P<punct>'
                   r'(^|\b|(?<=\s))(%s)((?=[\s.,:;!?)/&=+"\'—-])|\b|$))' %
-                  r"|".join(re.escape(k) for k in punct), 130)
+                  r"|".join(re.escape(k) for k in
+                            sorted(punct, key=len, reverse=True)), 130)
     def _line_punct(self, punct):
         return self.punct.get(punct, punct)
 
@@ -323,7 +378,9 @@ class WikiParser(object):
     def _line_newline(self):
         return "\n"
 
-    @markup_rules(r"(?P<plain_text>.+?)", 150)
+    # Take whole runs of letters at once, no other markup can start inside
+    # them. ASCII letters are separate, so that "1http://" still links.
+    @markup_rules(r"(?P<plain_text>[a-zA-Z]+|[^\Wa-zA-Z]+|.+?)", 150)
     def _line_text(self, plain_text):
         return escape(plain_text)
 
@@ -455,18 +512,20 @@ class WikiParser(object):
         first_line = None
         in_head = False
         for self.line_no, line in block:
+            # build the whole row, and yield it at once
+            row = []
             if first_line is None:
                 first_line = self.line_no
-                yield '<table id="line_%d">' % first_line
+                row.append('<table id="line_%d">' % first_line)
             table_row = line.strip()
             is_header = table_row.startswith('|=') and table_row.endswith('=|')
             if not in_head and is_header:
                 in_head = True
-                yield '<thead>'
+                row.append('<thead>')
             elif in_head and not is_header:
                 in_head = False
-                yield '</thead>'
-            yield '<tr>'
+                row.append('</thead>')
+            row.append('<tr>')
             in_cell = False
             in_th = False
 
@@ -474,9 +533,9 @@ class WikiParser(object):
                 if part in ('=|', '|', '=|=', '|='):
                     if in_cell:
                         if in_th:
-                            yield '</th>'
+                            row.append('</th>')
                         else:
-                            yield '</td>'
+                            row.append('</td>')
                         in_cell = False
                     if part in ('=|=', '|='):
                         in_th = True
@@ -485,17 +544,18 @@ class WikiParser(object):
                 else:
                     if not in_cell:
                         if in_th:
-                            yield '<th>'
+                            row.append('<th>')
                         else:
-                            yield '<td>'
+                            row.append('<td>')
                         in_cell = True
-                    yield part
+                    row.append(part)
             if in_cell:
                 if in_th:
-                    yield '</th>'
+                    row.append('</th>')
                 else:
-                    yield '</td>'
-            yield '</tr>'
+                    row.append('</td>')
+            row.append('</tr>')
+            yield "".join(row)
         yield '</table>'
 
     @block_rules(r"^\s*$", 40)
@@ -524,6 +584,7 @@ class WikiParser(object):
         in_ul = False
         kind = None
         for self.line_no, line in block:
+            item = []
             bullets = self.list_re.match(line).group(0).strip()
             nest = len(bullets)
             if kind is None:
@@ -533,20 +594,21 @@ class WikiParser(object):
                     kind = 'ol'
             while nest > level:
                 if in_ul:
-                    yield '<li>'
-                yield '<%s id="line_%d">' % (kind, self.line_no)
+                    item.append('<li>')
+                item.append('<%s id="line_%d">' % (kind, self.line_no))
                 in_ul = True
                 level += 1
             while nest < level:
-                yield '</li></%s>' % kind
+                item.append('</li></%s>' % kind)
                 in_ul = False
                 level -= 1
             if nest == level and not in_ul:
-                yield '</li>'
+                item.append('</li>')
             content = line.lstrip().lstrip('*#').strip()
-            yield '<li>%s%s' % ("".join(self.parse_line(content)),
-                                self.pop_to(""))
+            item.append('<li>%s%s' % ("".join(self.parse_line(content)),
+                                      self.pop_to("")))
             in_ul = False
+            yield "".join(item)
         yield ('</li></%s>' % kind) * level
 
     @block_rules(quote_pat, 80)
@@ -29,6 +29,24 @@ def response(
     return response
 
 
+def not_modified(request, title, etag="", rev=None, date=None):
+    """
+    Check the etag of a page before its content is generated. Returns an
+    empty "304 Not Modified" response if the client has that version of
+    the page already, None otherwise.
+    """
+
+    environ = request.environ
+    if not (
+        "HTTP_IF_NONE_MATCH" in environ or "HTTP_IF_MODIFIED_SINCE" in environ
+    ):
+        return None
+    resp = response(request, title, b"", etag, rev=rev, date=date)
+    if resp.status_code == 304:
+        return resp
+    return None
+
+
 class WikiResponse(Response):
     """A typical HTTP response class made out of Werkzeug's mixins."""
 
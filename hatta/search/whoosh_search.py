@@ -1,7 +1,7 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
-from collections import defaultdict
+from collections import Counter
 import re
 import os.path, os
 import time
@@ -154,10 +154,15 @@ r"""0-9A-Za-z０-９Ａ-Ｚａ-ｚΑ-Ωα-ωА-я]+""", re.UNICODE)
     def split_japanese_text(self, text):
         """Splits text into words, including rules for Japanese"""
 
+        jword_finditer = self.jword_pattern.finditer
         for match in self.word_pattern.finditer(text):
             word = match.group(0)
+            if word.isascii() and word.isalnum():
+                # plain latin words are a single [0-9A-Za-z]+ run anyway
+                yield word.lower()
+                continue
             got_japanese = False
-            for m in self.jword_pattern.finditer(word):
+            for m in jword_finditer(word):
                 w = m.group(0)
                 got_japanese = True
                 yield w.lower()
@@ -195,11 +200,16 @@ r"""0-9A-Za-z０-９Ａ-Ｚａ-ｚΑ-Ωα-ωА-я]+""", re.UNICODE)
         links = []
         wanted = []
         if extract_links and text:
+            seen = set()
             for link, label in extract_links(text):
                 qlink = link.replace(u' ', u'%20')
                 label = label.replace(u' ', u'%20')
                 links.append('%s:%s' % (qlink, label))
-                if link[0] != '+' and link not in wanted and link not in page.storage:
+                # check every linked page only once
+                if link in seen:
+                    continue
+                seen.add(link)
+                if link[0] != '+' and link not in page.storage:
                     wanted.append(qlink)
         else:
             links = []
@@ -255,6 +265,8 @@ r"""0-9A-Za-z０-９Ａ-Ｚａ-ｚΑ-Ωα-ωА-я]+""", re.UNICODE)
                 writer.delete_by_term('title', title, searcher=s)
             self.reindex_page(page, title, writer, text=text)
         self.set_last_revision(page.revision.rev)
+        if page.wiki.cache:
+            page.wiki.cache.delete('links.%s' % title.replace(' ', '%20'))
 
     def orphaned_pages(self, wiki):
         """Gives all pages with no links to them."""
@@ -269,13 +281,12 @@ r"""0-9A-Za-z０-９Ａ-Ｚａ-ｚΑ-Ωα-ωА-я]+""", re.UNICODE)
     def wanted_pages(self, wiki):
         """Gives all pages that are linked to, but don't exist, together with
         the number of links."""
-        wanted = defaultdict(int)
+        wanted = Counter()
         for doc in self.index.run_query(self.name, query.Every('wanted'), limit=8000):
-            for link in doc['wanted'].split(' '):
-                title = link.replace('%20', ' ')
-                if title not in wiki.storage:
-                    wanted[title] += 1
-        items = [(count, link) for link, count in wanted.items()]
+            wanted.update(link.replace('%20', ' ')
+                          for link in doc['wanted'].split(' '))
+        items = [(count, title) for title, count in wanted.items()
+                 if title not in wiki.storage]
         items.sort(reverse=True)
         return items
 
@@ -308,6 +319,8 @@ r"""0-9A-Za-z０-９Ａ-Ｚａ-ｚΑ-Ωα-ωА-я]+""", re.UNICODE)
                 for l in links.split():
                     link, label = l.split(':', 1)
                     linkitems.append((link.replace('%20', ' '), label.replace('%20', ' ')))
-                if cache_key:
-                    wiki.cache.set(cache_key, linkitems, timeout=86400)
+            # also remember pages without links, such as the usually
+            # missing lock page, reindexing removes the entry anyway
+            if cache_key:
+                wiki.cache.set(cache_key, linkitems, timeout=86400)
             return linkitems
@@ -1,4 +1,5 @@
 import datetime
+from functools import lru_cache
 import io
 import time
 import os, os.path
@@ -30,6 +31,44 @@ def merge_func(base, other, this):
     )
 
 
+# Escape special windows filenames and dot files
+_windows_device_files = frozenset(
+    [
+        "CON",
+        "AUX",
+        "COM1",
+        "COM2",
+        "COM3",
+        "COM4",
+        "LPT1",
+        "LPT2",
+        "LPT3",
+        "PRN",
+        "NUL",
+    ]
+)
+
+
+@lru_cache(maxsize=4096)
+def _title_to_file(title, repo_prefix, extension):
+    """
+    Quote the page title into a file name. Cached, because it's called
+    for every link on a page.
+    """
+
+    title = title.strip()
+    filename = quote(title, safe="")
+    if (
+        filename.split(".")[0].upper() in _windows_device_files
+        or filename.startswith("_")
+        or filename.startswith(".")
+    ):
+        filename = "_" + filename
+    if page.page_mime(title) == "text/x-wiki" and extension:
+        filename += extension
+    return os.path.join(repo_prefix, filename)
+
+
 class Revision:
     """
     Encapsulates page data and metadata
@@ -148,6 +187,29 @@ class BaseWikiStorage(threading.local):
         """
         raise NotImplementedError()
 
+    def recent_changes(self, limit=100):
+        """
+        Iterate over the latest changes of entire wiki, skipping the
+        repeated edits of a page by the same author with the same comment.
+        The "last_rev" of a change is the revision of the next listed
+        change of that page.
+        """
+        last = {}
+        last_rev = {}
+        count = 0
+        for item in self.history():
+            title = item["title"]
+            if (item["author"], item["comment"]) == last.get(title, (None, None)):
+                continue
+            item["last_rev"] = last_rev.get(title, item["rev"])
+            last[title] = item["author"], item["comment"]
+            last_rev[title] = item["rev"]
+            yield item
+            count += 1
+            if count >= limit:
+                # don't read any more of the history than needed
+                break
+
     def all_pages(self):
         """Iterate over the titles of all pages in the wiki."""
         raise NotImplementedError()
@@ -214,31 +276,7 @@ class BaseWikiStorage(threading.local):
         return self.all_pages()
 
     def _title_to_file(self, title):
-        title = str(title).strip()
-        filename = quote(title, safe="")
-        # Escape special windows filenames and dot files
-        _windows_device_files = (
-            "CON",
-            "AUX",
-            "COM1",
-            "COM2",
-            "COM3",
-            "COM4",
-            "LPT1",
-            "LPT2",
-            "LPT3",
-            "PRN",
-            "NUL",
-        )
-        if (
-            filename.split(".")[0].upper() in _windows_device_files
-            or filename.startswith("_")
-            or filename.startswith(".")
-        ):
-            filename = "_" + filename
-        if page.page_mime(title) == "text/x-wiki" and self.extension:
-            filename += self.extension
-        return os.path.join(self.repo_prefix, filename)
+        return _title_to_file(str(title), self.repo_prefix, self.extension)
 
     def _file_to_title(self, filepath):
         sep = os.path.sep
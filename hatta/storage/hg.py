@@ -117,6 +117,7 @@ class WikiStorage(BaseWikiStorage):
         if not os.path.exists(os.path.join(self.repo_path, ".hg")):
             # Create the repository if needed.
             mercurial.hg.repository(self.ui, self.repo_path.encode("utf8"), create=True)
+        self._filectx_cache = {}
 
     def get_cache_path(self):
         return os.path.join(self.repo_path, ".hg", "hatta", "cache")
@@ -131,6 +132,10 @@ class WikiStorage(BaseWikiStorage):
         """Get the changectx of the tip."""
         return self.repo[b"tip"]
 
+    def reopen(self):
+        super(WikiStorage, self).reopen()
+        self._filectx_cache = {}
+
     def _file_to_title(self, filepath):
         _ = self._
         if not filepath.startswith(self.repo_prefix):
@@ -259,20 +264,29 @@ class WikiStorage(BaseWikiStorage):
         return str(self.tip.rev())
 
     def _find_filectx(self, title):
-        """Find the last revision in which the file existed."""
+        """
+        Find the last revision in which the file existed. The results are
+        cached until the repository is reopened.
+        """
 
         repo_file = self._title_to_file(title).encode("utf8")
-        stack = [self.tip]
-        while stack:
-            changectx = stack.pop()
-            if repo_file in changectx:
-                return changectx[repo_file]
-            if changectx.rev() == 0:
-                return None
-            for parent in changectx.parents():
-                if parent != changectx:
-                    stack.append(parent)
-        return None
+        try:
+            return self._filectx_cache[repo_file]
+        except KeyError:
+            pass
+        filectx = None
+        if repo_file in self.tip:
+            filectx = self.tip[repo_file]
+        else:
+            # Deleted or missing files: the last revision in the filelog is
+            # the one from before the deletion, no need to walk the changes.
+            filelog = self.repo.file(repo_file)
+            if len(filelog):
+                filectx = self.repo.filectx(repo_file, fileid=len(filelog) - 1)
+        if len(self._filectx_cache) > 4096:
+            self._filectx_cache.clear()
+        self._filectx_cache[repo_file] = filectx
+        return filectx
 
     def page_history(self, title):
         """Iterate over the page's history."""
@@ -299,30 +313,38 @@ class WikiStorage(BaseWikiStorage):
     def history(self):
         """Iterate over the history of entire wiki."""
 
-        changectx = self.tip
-        maxrev = changectx.rev()
+        # Only look at the changelog entry to skip the changesets that
+        # touch no wiki files, without building a changectx for them.
+        changelog = self.repo.changelog
+        prefix = self.repo_prefix
+        maxrev = self.tip.rev()
         minrev = 0
         for wiki_rev in range(maxrev, minrev - 1, -1):
+            repo_files = [
+                repo_file
+                for repo_file in changelog.changelogrevision(wiki_rev).files
+                if repo_file.decode("utf8").startswith(prefix)
+            ]
+            if not repo_files:
+                continue
             change = self.repo[wiki_rev]
             date = _get_datetime(change)
             author = str(change.user(), "utf-8", "replace").split("<")[0].strip()
             comment = str(change.description(), "utf-8", "replace")
-            for repo_file in change.files():
-                repo_file_str = repo_file.decode("utf8")
-                if repo_file_str.startswith(self.repo_prefix):
-                    title = self._file_to_title(repo_file_str)
-                    try:
-                        rev = change[repo_file].filerev()
-                    except mercurial.error.LookupError:
-                        rev = -1
-                    yield {
-                        "title": title,
-                        "rev": str(rev),
-                        "date": date,
-                        "author": author,
-                        "comment": comment,
-                        "parent": str(rev - 1) if rev else None,
-                    }
+            for repo_file in repo_files:
+                title = self._file_to_title(repo_file.decode("utf8"))
+                try:
+                    rev = change[repo_file].filerev()
+                except mercurial.error.LookupError:
+                    rev = -1
+                yield {
+                    "title": title,
+                    "rev": str(rev),
+                    "date": date,
+                    "author": author,
+                    "comment": comment,
+                    "parent": str(rev - 1) if rev else None,
+                }
 
     def all_pages(self):
         """Iterate over the titles of all pages in the wiki."""
@@ -3,17 +3,19 @@
 import itertools
 import re
 import datetime
+import functools
 import hashlib
+import heapq
 import os
 import tempfile
 import pkgutil
 
 from urllib.parse import quote, unquote
 
-from werkzeug import urls, wsgi
+from werkzeug import urls
 from markupsafe import escape, Markup
 from werkzeug.utils import redirect
-from dominate import tags
+from dominate import tags, util
 import werkzeug
 
 captcha = None
@@ -30,7 +32,7 @@ except ImportError:
 import hatta.page
 import hatta.parser
 import hatta.error
-from hatta.response import response, WikiResponse
+from hatta.response import response, not_modified, WikiResponse
 
 
 class URL(object):
@@ -66,13 +68,20 @@ class URL(object):
         return dict((name, func) for name, func, url, methods in cls.urls)
 
 
+@functools.lru_cache(maxsize=None)
+def _default_data(filename):
+    """The default files are part of the package, read each only once."""
+
+    return pkgutil.get_data("hatta", os.path.join("static", filename))
+
+
 def _serve_default(request, title, content=None, mime=None):
     """Some pages have their default content."""
 
     if title in request.wiki.storage:
         return download(request, title)
     if content is None:
-        content = pkgutil.get_data("hatta", os.path.join("static", title))
+        content = _default_data(title)
     mime = mime or "application/octet-stream"
     resp = WikiResponse(
         content,
@@ -91,7 +100,13 @@ def view(request, title=None):
     if title is None:
         title = request.wiki.front_page
     page = hatta.page.get_page(request, title)
+    etag = "/(%s)" % ",".join(sorted(page.dependencies()))
     try:
+        resp = not_modified(
+            request, title, etag, rev=page.revision.rev, date=page.revision.date
+        )
+        if resp is not None:
+            return resp
         content = page.view_content()
     except hatta.error.NotFoundErr:
         if request.wiki.fallback_url:
@@ -107,8 +122,6 @@ def view(request, title=None):
         url = request.get_url(title, "edit", external=True)
         return redirect(url, code=303)
     phtml = page.template("page.html", content=content)
-    dependencies = page.dependencies()
-    etag = "/(%s)" % ",".join(dependencies)
     return response(
         request, title, phtml, etag=etag, rev=page.revision.rev, date=page.revision.date
     )
@@ -334,9 +347,17 @@ def download_rev(request, title, rev):
     if mime == "text/x-wiki":
         mime = "text/plain"
     revision = request.wiki.storage.get_revision(title, rev)
-    data = wsgi.wrap_file(request.environ, revision.file)
+    # the data is already in memory, send it in one piece with a length
+    data = revision.data
     resp = response(
-        request, title, data, "/download", mime, rev=revision.rev, date=revision.date
+        request,
+        title,
+        data,
+        "/download",
+        mime,
+        rev=revision.rev,
+        size=len(data),
+        date=revision.date,
     )
     # give browsers a useful filename hint
     if rev:
@@ -344,7 +365,6 @@ def download_rev(request, title, rev):
     else:
         filename = title
     resp.headers.add("Content-Disposition", 'filename="%s"' % quote(filename))
-    resp.direct_passthrough = True
     return resp
 
 
@@ -442,8 +462,23 @@ def history(request, title):
     if title not in request.wiki.storage:
         _ = request.wiki.gettext
         raise hatta.error.NotFoundErr(_("Page not found."))
+    resp = not_modified(request, title, "/history")
+    if resp is not None:
+        return resp
 
-    for item in request.wiki.storage.page_history(title):
+    # the history only changes with the repository revision
+    if request.wiki.cache:
+        cache_key = "history:%s:%s" % (
+            hashlib.md5(title.encode("utf8")).hexdigest(),
+            request.wiki.storage.repo_revision,
+        )
+        page_history = request.wiki.cache.get(cache_key)
+        if page_history is None:
+            page_history = list(request.wiki.storage.page_history(title))
+            request.wiki.cache.set(cache_key, page_history, timeout=86400)
+    else:
+        page_history = request.wiki.storage.page_history(title)
+    for item in page_history:
         parent = item["parent"]
         if can_diff:
             if parent:
@@ -483,10 +518,7 @@ def history(request, title):
 
 
 def _changes_list(request):
-    last = {}
-    lastrev = {}
-    count = 0
-    for item in request.wiki.storage.history():
+    for item in request.wiki.storage.recent_changes(100):
         title = item["title"]
         rev = item["rev"]
         parent = item["parent"]
@@ -494,18 +526,13 @@ def _changes_list(request):
         author = item["author"]
         comment = item["comment"]
 
-        if (author, comment) == last.get(title, (None, None)):
-            continue
-        count += 1
-        if count > 100:
-            break
         if parent:
             date_url = request.adapter.build(
                 "diff",
                 {
                     "title": title,
                     "from_rev": parent,
-                    "to_rev": lastrev.get(title, rev),
+                    "to_rev": item["last_rev"],
                 },
                 force_external=True,
             )
@@ -521,9 +548,6 @@ def _changes_list(request):
             date_url = request.adapter.build(
                 "history", {"title": quote(title, safe="")}
             )
-        last[title] = author, comment
-        lastrev[title] = rev
-
         yield date, date_url, title, author, comment
 
 
@@ -577,9 +601,24 @@ def diff(request, title, from_rev, to_rev):
     )
     diff_content = getattr(page, "diff_content", None)
     if diff_content:
-        from_text = request.wiki.storage.get_revision(page.title, from_rev).text
-        to_text = request.wiki.storage.get_revision(page.title, to_rev).text
-        content = page.diff_content(from_text, to_text, message)
+        # old revisions never change, so neither does the diff between them
+        cache = request.wiki.cache
+        if cache:
+            cache_key = "diff:%s:%s:%s" % (
+                hashlib.md5(title.encode("utf8")).hexdigest(),
+                from_rev,
+                to_rev,
+            )
+            cached = cache.get(cache_key)
+        else:
+            cached = None
+        if cached is None:
+            from_text = request.wiki.storage.get_revision(page.title, from_rev).text
+            to_text = request.wiki.storage.get_revision(page.title, to_rev).text
+            cached = list(page.diff_content(from_text, to_text))
+            if cache:
+                cache.set(cache_key, cached, timeout=86400)
+        content = itertools.chain([message], cached)
     else:
         content = [tags.p(Markup(_("Diff not available for this kind of pages.")))]
     special_title = _('Diff for "%(title)s"') % {"title": title}
@@ -671,17 +710,13 @@ def search(request):
 
     _ = request.wiki.gettext
 
-    def highlight_html(m):
-        return Markup(tags.b(m.group(0), class_="highlight"))
-
-    def search_snippet(title, words):
+    def search_snippet(title, regexp):
         """Extract a snippet of text for search results."""
 
         try:
             text = request.wiki.storage.get_revision(title).text
         except hatta.error.NotFoundErr:
             return ""
-        regexp = re.compile("|".join(re.escape(w) for w in words), re.U | re.I)
         match = regexp.search(text)
         if match is None:
             return ""
@@ -689,15 +724,21 @@ def search(request):
         min_pos = max(position - 60, 0)
         max_pos = min(position + 60, len(text))
         snippet = escape(text[min_pos:max_pos])
-        phtml = regexp.sub(highlight_html, snippet)
+        # the snippet is escaped already, so the matches can be used as they
+        # are, but the substitution has to be done on a plain str, as Markup
+        # would escape the inserted tags
+        phtml = regexp.sub(r'<b class="highlight">\g<0></b>', str(snippet))
         return Markup(phtml)
 
     def page_search(words, page, request):
         """Display the search results."""
 
         request.wiki.index.update(request.wiki)
-        result = sorted(request.wiki.index.find(words), key=lambda x: -x[0])
+        result = list(request.wiki.index.find(words))
+        regexp = re.compile("|".join(re.escape(w) for w in words), re.U | re.I)
         yield tags.p(Markup(_("%d page(s) containing all words:") % len(result)))
+        # every shown hit reads its page for the snippet, show the best only
+        result = heapq.nlargest(100, result, key=lambda x: x[0])
         ol = tags.ol(id="hatta-search-results")
         with ol:
             for number, (score, title) in enumerate(result):
@@ -705,11 +746,9 @@ def search(request):
                     with tags.b():
                         page.wiki_link(title)
                     tags.i(str(score))
+                    # dominate would escape the Markup of the snippet again
                     tags.div(
-                        search_snippet(
-                            title,
-                            words,
-                        ),
+                        util.raw(search_snippet(title, regexp)),
                         class_="hatta-snippet",
                         id="search-%d" % (number + 1),
                     )
@@ -766,12 +805,18 @@ def pygments_css(request):
     if pygments is None:
         raise hatta.error.NotImplementedErr(_("Code highlighting is not available."))
 
-    pygments_style = request.wiki.pygments_style
+    style_defs = _pygments_style_defs(request.wiki.pygments_style)
+    return _serve_default(request, "pygments.css", style_defs, "text/css")
+
+
+@functools.lru_cache(maxsize=16)
+def _pygments_style_defs(pygments_style):
+    """Generating the style sheet takes a while, and it never changes."""
+
     if pygments_style not in pygments.styles.STYLE_MAP:
         pygments_style = "default"
     formatter = pygments.formatters.HtmlFormatter(style=pygments_style)
-    style_defs = formatter.get_style_defs(".highlight")
-    return _serve_default(request, "pygments.css", style_defs, "text/css")
+    return formatter.get_style_defs(".highlight")
 
 
 @URL("/favicon.ico")
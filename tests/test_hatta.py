@@ -34,6 +34,20 @@ def wiki(request, tmp_path):
     return hatta.Wiki(config)
 
 
+@pytest.fixture
+def cached_wiki(request, tmp_path):
+    """A wiki with the cache in the repository, as set up by default."""
+
+    pytest.importorskip('cachelib')
+    config = hatta.WikiConfig(
+        pages_path=os.path.join(tmp_path, 'pages'),
+    )
+    request.addfinalizer(lambda: clear_directory(tmp_path))
+    wiki = hatta.Wiki(config)
+    assert wiki.cache is not None
+    return wiki
+
+
 class TestHattaStandalone(object):
     docstring = b'''<!doctype html>\n<html lang="en">'''
 
@@ -45,6 +59,11 @@ class TestHattaStandalone(object):
         for got, expected in zip(result, after):
             assert got == expected
 
+    def test_japanese_splitting_latin(self, wiki):
+        text = "Hatta wiki-page foo_bar 日本語テキスト"
+        after = ['hatta', 'wiki', 'page', 'foo', 'bar', '日本語', 'テキスト']
+        assert list(wiki.index.split_japanese_text(text)) == after
+
     def test_front_page(self, wiki):
         """Check that Home page doesn't exist and redirects to editor."""
 
@@ -115,6 +134,80 @@ class TestHattaStandalone(object):
         assert response.status_code == 200
         data = b''.join(response.response)
         assert b'>searching</a>' in data
+        assert b'<b class="highlight">test</b>' in data
+
+    def test_wanted(self, wiki):
+        """Test that links to missing pages are counted."""
+
+        client = werkzeug.Client(wiki.application, hatta.WikiResponse)
+        for title in ('first', 'second'):
+            data = ('text=[[Missing]]%%20[[first]]&parent=-1&comment=created'
+                    '&author=test&save=Save')
+            response = client.post('/+edit/%s' % title, data=data,
+                                content_type='application/x-www-form-urlencoded')
+            assert response.status_code == 303
+        assert wiki.index.wanted_pages(wiki) == [(2, 'Missing')]
+
+    def test_download(self, wiki):
+        """Test that raw page content is served with its length."""
+
+        client = werkzeug.Client(wiki.application, hatta.WikiResponse)
+        data = 'text=downloaded&parent=-1&comment=created&author=test&save=Save'
+        response = client.post('/+edit/raw', data=data,
+                            content_type='application/x-www-form-urlencoded')
+        assert response.status_code == 303
+        response = client.get('/+download/raw')
+        assert response.status_code == 200
+        assert response.content_length == len(b'downloaded')
+        assert response.get_data() == b'downloaded'
+
+    def test_not_modified(self, wiki):
+        """Test that pages the client has already are not sent again."""
+
+        client = werkzeug.Client(wiki.application, hatta.WikiResponse)
+        data = 'text=cached&parent=-1&comment=created&author=test&save=Save'
+        response = client.post('/+edit/cached', data=data,
+                            content_type='application/x-www-form-urlencoded')
+        assert response.status_code == 303
+        for url in ['/cached', '/+history/cached']:
+            response = client.get(url)
+            assert response.status_code == 200
+            etag = response.headers['ETag']
+            response = client.get(url, headers={'If-None-Match': etag})
+            assert response.status_code == 304
+            assert response.get_data() == b''
+
+    def test_recent_changes_limit(self, wiki):
+        """Test that recent changes stop reading history at the limit."""
+
+        storage = wiki.storage
+        for number in range(5):
+            with storage:
+                storage.save_text('page%d' % number, 'text', 'test',
+                                  'change %d' % number)
+        read = []
+        history = storage.history
+
+        def counting_history():
+            for item in history():
+                read.append(item)
+                yield item
+
+        storage.history = counting_history
+        changes = list(storage.recent_changes(2))
+        assert [c['comment'] for c in changes] == ['change 4', 'change 3']
+        assert len(read) == 2
+
+    def test_diff_big_block(self, wiki):
+        """Test that big rewritten blocks are diffed as whole lines."""
+
+        old = ['old line %d' % i for i in range(100)]
+        new = ['new line %d' % i for i in range(100)]
+        diff = list(hatta.page.diff_lines(['same'] + old, ['same'] + new))
+        assert diff[0] == ((1, 'same'), (1, 'same'), False)
+        assert diff[1] == ((2, '\0-old line 0\1'), ('', '\n'), True)
+        assert diff[101] == (('', '\n'), (2, '\0+new line 0\1'), True)
+        assert len(diff) == 201
 
     def test_read_only_edit(self, wiki):
         client = werkzeug.Client(wiki.application, hatta.WikiResponse)
@@ -133,6 +226,53 @@ class TestHattaStandalone(object):
         assert response.status_code == 403
 
 
+
+class TestHattaCache(object):
+    def save(self, client, title, text, comment):
+        data = {'text': text, 'comment': comment, 'author': 'test',
+                'save': 'Save'}
+        response = client.post('/+edit/%s' % title, data=data)
+        assert response.status_code == 303
+
+    def test_diff(self, cached_wiki):
+        """Test that a diff is the same when served from the cache."""
+
+        client = werkzeug.Client(cached_wiki.application, hatta.WikiResponse)
+        self.save(client, 'diffed', 'same\nold', 'created')
+        self.save(client, 'diffed', 'same\nnew', 'changed')
+        first = client.get('/+history/diffed/0:1').get_data()
+        second = client.get('/+history/diffed/0:1').get_data()
+        assert b'<del>old</del>' in first
+        assert b'<ins>new</ins>' in first
+        assert second == first
+
+    def test_history(self, cached_wiki):
+        """Test that the cached history shows new changes."""
+
+        client = werkzeug.Client(cached_wiki.application, hatta.WikiResponse)
+        self.save(client, 'story', 'first', 'first comment')
+        data = client.get('/+history/story').get_data()
+        assert b'first comment' in data
+        assert b'second comment' not in data
+        self.save(client, 'story', 'second', 'second comment')
+        data = client.get('/+history/story').get_data()
+        assert b'first comment' in data
+        assert b'second comment' in data
+
+    def test_preview(self, cached_wiki):
+        """Test that repeated previews render the previewed text."""
+
+        client = werkzeug.Client(cached_wiki.application, hatta.WikiResponse)
+        for text, html in [('some **bold**', b'<b>bold</b>'),
+                           ('some **bold**', b'<b>bold</b>'),
+                           ('some //italic//', b'<i>italic</i>')]:
+            data = {'text': text, 'preview': 'Preview'}
+            response = client.post('/+edit/previewed', data=data)
+            data = response.get_data()
+            preview = data[data.index(b'id="hatta-preview"'):]
+            assert html in preview
+
+
 class TestHattaParser(object):
 
     def parse_text(self, text):
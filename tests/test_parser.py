@@ -230,6 +230,16 @@ test</p>"""
         html = parse('**test')
         assert html == """<p id="line_0"><b>test</b></p>"""
 
+    def test_dashes(self):
+        html = parse('a -- b --- c --> d')
+        assert html == """<p id="line_0">a &ndash; b &mdash; c &rarr; d</p>"""
+
+    def test_rules_compiled_once(self):
+        parse('first')
+        rule_params = hatta.parser.WikiParser.markup_rules.rule_params
+        parse('second :)')
+        assert hatta.parser.WikiParser.markup_rules.rule_params is rule_params
+
     def test_basic_table(self):
         html = parse('|x|y|z|\n|a|b|c|\n|d|e|f|\ntest')
         assert html == """
@@ -296,6 +296,19 @@ class TestStorage(object):
         saved = repo.get_revision(self.title).text
         assert saved == self.text
 
+    def test_save_text_twice(self, repo):
+        """
+        Save a page twice, verify that the second revision is read back.
+        """
+        with repo:
+            repo.save_text(self.title, self.text, self.author, self.comment,
+                           parent=-1)
+        assert repo.get_revision(self.title).text == self.text
+        with repo:
+            repo.save_text(self.title, "changed", self.author, self.comment)
+        assert repo.get_revision(self.title).text == "changed"
+        assert repo.get_revision(self.title, 0).text == self.text
+
     def test_save_merge_no_conflict(self, repo):
         """
         Create a page two times, with the same content. Verify that